@@ -0,0 +1,45 @@
+import argparse
+
+import onnx
+from onnx import TensorProto, helper
+
+
+def append_argmax(model: onnx.ModelProto) -> onnx.ModelProto:
+    """Replace the decoder's logits output with the greedy next token id."""
+    graph = model.graph
+
+    graph.initializer.extend([
+        helper.make_tensor("next_token_starts", TensorProto.INT64, [1], [-1]),
+        helper.make_tensor("next_token_ends", TensorProto.INT64, [1], [2**63 - 1]),
+        helper.make_tensor("next_token_axes", TensorProto.INT64, [1], [1]),
+    ])
+
+    # logits (batch, sequence, vocab) -> last step (batch, 1, vocab) -> (batch, 1)
+    graph.node.extend([
+        helper.make_node(
+            "Slice",
+            ["logits", "next_token_starts", "next_token_ends", "next_token_axes"],
+            ["last_logits"],
+        ),
+        helper.make_node("ArgMax", ["last_logits"], ["next_token"], axis=-1, keepdims=0),
+    ])
+
+    outputs = [output for output in graph.output if output.name != "logits"]
+    del graph.output[:]
+    graph.output.append(
+        helper.make_tensor_value_info("next_token", TensorProto.INT64, ["batch_size", 1])
+    )
+    graph.output.extend(outputs)
+
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append a greedy ArgMax to the manga-ocr decoder")
+    parser.add_argument("--input", type=str, help="Path to the decoder ONNX model")
+    parser.add_argument("--output", type=str, default="decoder_argmax.onnx", help="Path to write the model to")
+    args = parser.parse_args()
+
+    model = append_argmax(onnx.load(args.input))
+    onnx.checker.check_model(model)
+    onnx.save(model, args.output)
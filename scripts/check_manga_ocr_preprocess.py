@@ -0,0 +1,49 @@
+import sys
+
+import numpy as np
+from PIL import Image
+
+from manga_ocr_onnx_inference import MangaOCR
+
+# mean absolute deviation allowed on the [-1, 1] pixel scale
+MAX_MEAN_DEVIATION = 0.03
+
+
+def pil_preprocess(image: Image.Image) -> np.ndarray:
+    """The original PIL pipeline MangaOCR._preprocess has to stay close to"""
+    image = image.convert("L").convert("RGB").resize((224, 224), resample=2)
+    image = np.array(image, dtype=np.float32) / 255
+    image = (image - 0.5) / 0.5
+
+    return image.transpose((2, 0, 1))[None]
+
+
+def synthetic_crop(rng: np.random.Generator, height: int, width: int) -> Image.Image:
+    """Blocky gray crop with noise, standing in for text strokes on a balloon"""
+    blocks = rng.integers(0, 256, (height // 10 + 1, width // 10 + 1))
+    crop = np.repeat(np.repeat(blocks, 10, axis=0), 10, axis=1)[:height, :width]
+    crop = crop + rng.integers(-20, 20, crop.shape)
+
+    return Image.fromarray(np.clip(crop, 0, 255).astype(np.uint8))
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+
+    # tall and wide crops shrink along one axis only, vertical text bubbles
+    # are the most common case
+    crops = {
+        f"{height}x{width}": synthetic_crop(rng, height, width)
+        for height, width in [(500, 70), (70, 500), (600, 400), (300, 150), (100, 120), (224, 224)]
+    }
+    for path in sys.argv[1:]:
+        crops[path] = Image.open(path)
+
+    failed = False
+    for name, crop in crops.items():
+        deviation = np.abs(MangaOCR._preprocess(crop) - pil_preprocess(crop))
+        ok = deviation.mean() <= MAX_MEAN_DEVIATION
+        failed |= not ok
+        print(f"{name}: mean {deviation.mean():.4f} max {deviation.max():.3f} {'ok' if ok else 'FAIL'}")
+
+    sys.exit(1 if failed else 0)
@@ -3,7 +3,9 @@ import cv2
 
 img = cv2.imread('data/1746025823_segment.png')
 
-kernel = np.ones((3,3),np.uint8)
+# 3x3 rectangle split into 1x3 and 3x1 passes for the separable dilate path
+row_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 1))
+col_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 3))
 h, w = img.shape[0], img.shape[1]
 seedpnt = (int(w/2), int(h/2))
 difres = 10
@@ -12,13 +14,11 @@ difres = 10
 img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
 # ballon_mask = img - 127
-ballon_mask = 127 - img
-ballon_mask = img
-ballon_mask = cv2.dilate(ballon_mask, kernel,iterations = 1)
+ballon_mask = cv2.dilate(img, row_kernel)
+cv2.dilate(ballon_mask, col_kernel, dst=ballon_mask)
 # ballon_area, _, _, rect = cv2.floodFill(ballon_mask, mask=None, seedPoint=seedpnt,  flags=4, newVal=(30), loDiff=(difres, difres, difres), upDiff=(difres, difres, difres))
-ballon_mask = 30 - ballon_mask
-retval, ballon_mask = cv2.threshold(ballon_mask, 1, 255, cv2.THRESH_BINARY)
-ballon_mask = cv2.bitwise_not(ballon_mask, ballon_mask)
+# same mask as not(threshold(30 - ballon_mask, 1)) with uint8 wraparound, in a single pass
+ballon_mask = cv2.inRange(ballon_mask, 29, 30)
 
 # box_kernel = int(np.sqrt(ballon_area) / 30)
 # if box_kernel > 1:
@@ -29,3 +29,12 @@ torch.onnx.export(
         },
     },
 )
+
+# scripts/manga_ocr_onnx_inference.py uses split encoder/decoder models. Export
+# them with the KV cache enabled so the decoder exposes past_key_values.* inputs
+# and present.* outputs and only attends over the newest token per step:
+#
+#   optimum-cli export onnx --model kha-white/manga-ocr-base \
+#       --task image-to-text-with-past models/manga-ocr/
+#
+# then pass models/manga-ocr/decoder_model_merged.onnx as --decoder-model.
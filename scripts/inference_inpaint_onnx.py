@@ -1,11 +1,11 @@
 import cv2
 import numpy as np
-import onnxruntime
-import torch
 import io
 import requests
 from PIL import Image
 
+from onnx_session import make_session, runs_on_cpu
+
 def get_image(image):
     if isinstance(image, Image.Image):
         img = np.array(image)
@@ -50,14 +50,25 @@ def pad_img_to_modulo(img, mod):
     channels, height, width = img.shape
     out_height = ceil_modulo(height, mod)
     out_width = ceil_modulo(width, mod)
-    return np.pad(
-        img,
-        ((0, 0), (0, out_height - height), (0, out_width - width)),
-        mode="symmetric",
+
+    # BORDER_REFLECT repeats the edge pixel, same as np.pad's "symmetric" mode
+    img = cv2.copyMakeBorder(
+        np.transpose(img, (1, 2, 0)),
+        0,
+        out_height - height,
+        0,
+        out_width - width,
+        cv2.BORDER_REFLECT,
     )
 
+    if img.ndim == 2:
+        img = img[None, ...]
+    else:
+        img = np.transpose(img, (2, 0, 1))
+    return img
 
-def prepare_img_and_mask(image, mask, device, pad_out_to_modulo=8, scale_factor=None):
+
+def prepare_img_and_mask(image, mask, pad_out_to_modulo=8, scale_factor=None, mask_dtype=np.float32):
     out_image = get_image(image)
     out_mask = get_image(mask)
 
@@ -69,10 +80,13 @@ def prepare_img_and_mask(image, mask, device, pad_out_to_modulo=8, scale_factor=
         out_image = pad_img_to_modulo(out_image, pad_out_to_modulo)
         out_mask = pad_img_to_modulo(out_mask, pad_out_to_modulo)
 
-    out_image = torch.from_numpy(out_image).unsqueeze(0).to(device)
-    out_mask = torch.from_numpy(out_mask).unsqueeze(0).to(device)
-
-    out_mask = (out_mask > 0) * 1
+    out_image = np.ascontiguousarray(out_image[None], dtype=np.float32)
+    out_mask = out_mask[None] > 0
+    if mask_dtype == np.uint8:
+        # bool and uint8 share a layout, reinterpret the 0/1 mask without a copy
+        out_mask = out_mask.view(np.uint8)
+    else:
+        out_mask = out_mask.astype(mask_dtype)
 
     return out_image, out_mask
 
@@ -87,8 +101,15 @@ def open_image(image):
 
 
 
-sess_options = onnxruntime.SessionOptions()
-model = onnxruntime.InferenceSession('models/lama_manga.onnx', sess_options=sess_options)
+# the int8 model written by quantize_onnx_models.py is opt-in and CPU only, its
+# dynamically quantized ops have no CUDA or TensorRT kernels. Time it against
+# the float32 model on the target CPU before turning it on
+use_int8 = False # @param {type:"boolean"}
+
+model_path = 'models/lama_manga.onnx'
+if use_int8 and runs_on_cpu():
+    model_path = 'models/lama_manga.int8.onnx'
+model = make_session(model_path)
 
 image_url = "https://huggingface.co/Carve/LaMa-ONNX/resolve/main/image.jpg" # @param {type:"string"}
 mask_url = "https://huggingface.co/Carve/LaMa-ONNX/resolve/main/mask.png" # @param {type:"string"}
@@ -96,16 +117,16 @@ mask_url = "https://huggingface.co/Carve/LaMa-ONNX/resolve/main/mask.png" # @par
 image = open_image(image_url).resize((512, 512))
 mask = open_image(mask_url).convert("L").resize((512, 512))
 
-image, mask = prepare_img_and_mask(image, mask, 'cpu')
-# Run the model
-outputs = model.run(None,
-                    {'image': image.numpy().astype(np.float32),
-                     'mask': mask.numpy().astype(np.float32)})
+# feed the mask as uint8 when the model takes it natively, a quarter of the float32 bytes
+mask_input = next(inp for inp in model.get_inputs() if inp.name == 'mask')
+mask_dtype = np.uint8 if mask_input.type == 'tensor(uint8)' else np.float32
 
+image, mask = prepare_img_and_mask(image, mask, mask_dtype=mask_dtype)
+# Run the model
+outputs = model.run(None, {'image': image, 'mask': mask})
 
-output = outputs[0][0] * 256
 # Postprocess the outputs
+output = np.clip(outputs[0][0] * 255, 0, 255).astype(np.uint8)
 output = output.transpose(1, 2, 0)
-output = output.astype(np.uint8)
 output = Image.fromarray(output)
 output.show()
@@ -5,32 +5,55 @@ import manga109api
 import shutil
 import random
 import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, boxes_to_yolo then runs as plain NumPy
+    njit = None
 
-def convert_to_yolo_format(x_min, y_min, x_max, y_max, img_width, img_height):
-    """Convert bounding box from Manga109 format to YOLO format."""
-    x_center = ((x_min + x_max) / 2) / img_width
-    y_center = ((y_min + y_max) / 2) / img_height
-    width = (x_max - x_min) / img_width
-    height = (y_max - y_min) / img_height
+
+def boxes_to_yolo(x_min, y_min, x_max, y_max, img_width, img_height):
+    """Convert all bounding boxes of a page from Manga109 format to YOLO format."""
+    # Divide once per page, each box then only multiplies
+    inv_width = 1.0 / img_width
+    inv_height = 1.0 / img_height
+
+    x_center = (x_min + x_max) * 0.5 * inv_width
+    y_center = (y_min + y_max) * 0.5 * inv_height
+    width = (x_max - x_min) * inv_width
+    height = (y_max - y_min) * inv_height
 
     return x_center, y_center, width, height
 
 
-def process_annotation(ann, class_id, img_width, img_height, out_file):
-    """Process a single annotation and write to output file."""
-    x_min = int(ann["@xmin"])
-    y_min = int(ann["@ymin"])
-    x_max = int(ann["@xmax"])
-    y_max = int(ann["@ymax"])
+if njit is not None:
+    boxes_to_yolo = njit(parallel=True, fastmath=True, cache=True)(boxes_to_yolo)
 
-    x_center, y_center, width, height = convert_to_yolo_format(
-        x_min, y_min, x_max, y_max, img_width, img_height
-    )
 
-    out_file.write(
-        f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n"
-    )
+def page_boxes(page, class_map):
+    """Collect the class ids and corners of every annotation on a page."""
+    class_ids = []
+    corners = []
+
+    # Process each annotation type
+    for ann_type in ["frame", "text"]:
+        if ann_type in page:
+            # Handle both single annotation and list of annotations
+            annotations = page[ann_type]
+            if not isinstance(annotations, list):
+                annotations = [annotations]
+
+            for ann in annotations:
+                class_ids.append(class_map[ann_type])
+                corners.append(
+                    (ann["@xmin"], ann["@ymin"], ann["@xmax"], ann["@ymax"])
+                )
+
+    corners = np.array(corners, dtype=np.int32).reshape(-1, 4)
+
+    return np.array(class_ids, dtype=np.int32), corners
 
 
 def manga109_to_yolo(manga109_root_dir, output_dir):
@@ -85,6 +108,8 @@ def manga109_to_yolo(manga109_root_dir, output_dir):
 
 def process_books(parser, book_list, output_dir, class_map, split_type):
     """Process books for either train or val split."""
+    copy_tasks = []
+
     for book in book_list:
         print(f"Processing {book} for {split_type}...")
 
@@ -100,33 +125,37 @@ def process_books(parser, book_list, output_dir, class_map, split_type):
             # Create unique filename
             filename = f"{book}_{page_idx:03d}"
 
-            # Copy the image
+            # Queue the image copy
             img_src_path = parser.img_path(book=book, index=page_idx)
             img_dst_path = os.path.join(
                 output_dir, "images", split_type, f"{filename}.jpg"
             )
 
             if os.path.exists(img_src_path):
-                shutil.copy2(img_src_path, img_dst_path)
+                copy_tasks.append((img_src_path, img_dst_path))
 
             # Create annotation file
             label_path = os.path.join(
                 output_dir, "labels", split_type, f"{filename}.txt"
             )
 
-            with open(label_path, "w") as f:
-                # Process each annotation type
-                for ann_type in ["frame", "text"]:
-                    if ann_type in page:
-                        # Handle both single annotation and list of annotations
-                        annotations = page[ann_type]
-                        if not isinstance(annotations, list):
-                            annotations = [annotations]
-
-                        for ann in annotations:
-                            process_annotation(
-                                ann, class_map[ann_type], img_width, img_height, f
-                            )
+            class_ids, corners = page_boxes(page, class_map)
+            x_min, y_min, x_max, y_max = corners.T
+            x_center, y_center, width, height = boxes_to_yolo(
+                x_min, y_min, x_max, y_max, img_width, img_height
+            )
+
+            # Write the whole page at once
+            np.savetxt(
+                label_path,
+                np.column_stack([class_ids, x_center, y_center, width, height]),
+                fmt="%d %.6f %.6f %.6f %.6f",
+            )
+
+    # Copy the images concurrently, the GIL is released during file I/O
+    print(f"Copying {len(copy_tasks)} images for {split_type}...")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda task: shutil.copy2(*task), copy_tasks))
 
 
 def main():
@@ -1,31 +1,65 @@
 import re
+import cv2
 import jaconv
 import numpy as np
 import time
 
-from onnxruntime import InferenceSession
+from onnxruntime import OrtValue
 from PIL import Image
 
+from onnx_session import GPU_PROVIDERS, make_session, tensorrt_providers
+
+DOTS_RE = re.compile("[・.]{2,}")
+
 
 class MangaOCR:
-    def __init__(self, encoder_model_path: str, decoder_model_path: str, vocab_path: str):
-        self.encoder_session = InferenceSession(encoder_model_path)
-        self.decoder_session = InferenceSession(decoder_model_path)
+    def __init__(
+        self,
+        encoder_model_path: str,
+        decoder_model_path: str,
+        vocab_path: str,
+        tensorrt: bool = False,
+    ):
+        # one TensorRT engine profile covers batches of 1 to 32 crops
+        providers = tensorrt_providers(
+            trt_profile_min_shapes="pixel_values:1x3x224x224",
+            trt_profile_opt_shapes="pixel_values:8x3x224x224",
+            trt_profile_max_shapes="pixel_values:32x3x224x224",
+        ) if tensorrt else GPU_PROVIDERS
+        self.encoder_session = make_session(encoder_model_path, providers=providers)
+        # the decoder runs a small step per token, keeping it on the CPU avoids
+        # a host/device round trip on every step
+        self.decoder_session = make_session(decoder_model_path, providers=["CPUExecutionProvider"])
+        # decoders exported with the KV cache (optimum's decoder_model_merged.onnx)
+        # expose past_key_values.* inputs and are decoded one token at a time
+        decoder_inputs = self.decoder_session.get_inputs()
+        self.past_inputs = [
+            inp for inp in decoder_inputs if inp.name.startswith("past_key_values.")
+        ]
+        # only the merged decoder can run the first step without a past, through
+        # its use_cache_branch switch, decoder_with_past_model.onnx always needs one
+        if self.past_inputs and "use_cache_branch" not in {inp.name for inp in decoder_inputs}:
+            raise ValueError(
+                f"{decoder_model_path} takes past_key_values.* but has no use_cache_branch "
+                "input, pass decoder_model_merged.onnx or decoder_model.onnx instead"
+            )
+        # decoders patched by append_decoder_argmax.py return the greedy token id
+        # instead of the full logits, so only 8 bytes per step reach the host
+        decoder_outputs = {output.name for output in self.decoder_session.get_outputs()}
+        self.token_output = "next_token" if "next_token" in decoder_outputs else "logits"
         self.vocab = self._load_vocab(vocab_path)
 
-    def __call__(self, image: Image.Image) -> str:
-        image = self._preprocess(image)
+    def __call__(self, images: list[Image.Image]) -> list[str]:
+        # stack the crops so the encoder runs once for the whole batch
+        pixel_values = np.concatenate([self._preprocess(image) for image in images], axis=0)
 
         # count time
         start = time.time()
-        token_ids = self._generate(image)
+        token_ids = self._generate(pixel_values)
         end = time.time()
         print(f"Time taken: {end - start:.2f} seconds")
 
-        text = self._decode(token_ids)
-        text = self._postprocess(text)
-
-        return text
+        return [self._postprocess(self._decode(ids)) for ids in token_ids]
 
     def _load_vocab(self, vocab_file: str) -> list[str]:
         with open(vocab_file, "r", encoding="utf8") as f:
@@ -33,48 +67,140 @@ class MangaOCR:
 
         return vocab
 
-    def _preprocess(self, image: Image.Image) -> np.ndarray:
+    @staticmethod
+    def _preprocess(image: Image.Image) -> np.ndarray:
         # convert to grayscale
-        image = image.convert("L").convert("RGB")
-        # resize
-        image = image.resize((224, 224), resample=2)
-        # rescale
-        image = np.array(image, dtype=np.float32)
-        image /= 255
-        # normalize
-        image = (image - 0.5) / 0.5
-        # reshape from (224, 224, 3) to (3, 224, 224)
-        image = image.transpose((2, 0, 1))
-        # add batch size
-        image = image[None]
-
-        return image
-
-    def _generate(self, image: np.ndarray) -> np.ndarray:
+        image = np.asarray(image.convert("L"), dtype=np.uint8)
+        # resize one axis at a time, area averaging approximates PIL's antialiased
+        # bilinear on an axis that shrinks, so tall or wide crops that only shrink
+        # along one side still get it there
+        height, width = image.shape
+        image = cv2.resize(
+            image,
+            (224, height),
+            interpolation=cv2.INTER_AREA if width > 224 else cv2.INTER_LINEAR,
+        )
+        image = cv2.resize(
+            image,
+            (224, 224),
+            interpolation=cv2.INTER_AREA if height > 224 else cv2.INTER_LINEAR,
+        )
+        # replicate the gray channel 3 times as a zero-copy view
+        image = np.broadcast_to(image, (3, 224, 224))
+        # rescale and normalize in one pass, ((x / 255) - 0.5) / 0.5 == x / 127.5 - 1,
+        # writing straight into a contiguous (1, 3, 224, 224) buffer
+        pixel_values = np.empty((1, 3, 224, 224), dtype=np.float32)
+        np.multiply(image, np.float32(1 / 127.5), out=pixel_values[0])
+        pixel_values -= 1.0
+
+        return pixel_values
+
+    def _generate(self, pixel_values: np.ndarray) -> np.ndarray:
         encoder_hidden_states = self.encoder_session.run(None, {
-            "pixel_values": image,
+            "pixel_values": pixel_values,
         })[0]
 
-        token_ids = [2]
+        if self.past_inputs:
+            return self._generate_with_past(encoder_hidden_states)
 
-        for _ in range(300):
-            [logits] = self.decoder_session.run(
-                None,
-                {
-                    "encoder_hidden_states": encoder_hidden_states,
-                    "input_ids": np.array([token_ids], dtype=np.int64),
-                },
-            )
+        # every sequence in the batch grows by one token per step, finished ones
+        # are padded with the end token until the whole batch is done
+        batch_size = encoder_hidden_states.shape[0]
+        token_ids = np.empty((batch_size, 301), dtype=np.int64)
+        token_ids[:, 0] = 2
+        length = 1
+        finished = np.zeros(batch_size, dtype=bool)
 
-            token_id = logits[0, -1, :].argmax()
-            token_ids.append(int(token_id))
+        # the encoder states stay bound, only input_ids is rebound to the growing
+        # prefix of the preallocated token buffer each step
+        binding = self.decoder_session.io_binding()
+        binding.bind_ortvalue_input(
+            "encoder_hidden_states", OrtValue.ortvalue_from_numpy(encoder_hidden_states)
+        )
 
-            if token_id == 3:
+        for _ in range(300):
+            # a single row prefix is already contiguous and bound without a copy
+            binding.bind_cpu_input("input_ids", np.ascontiguousarray(token_ids[:, :length]))
+            # logits grow with the sequence, so the output is rebound for ORT to
+            # allocate at this step's shape instead of reusing the last one
+            binding.clear_binding_outputs()
+            binding.bind_output(self.token_output)
+            self.decoder_session.run_with_iobinding(binding)
+            [output] = binding.get_outputs()
+
+            next_tokens = self._next_tokens(output.numpy())
+            next_tokens[finished] = 3
+            token_ids[:, length] = next_tokens
+            length += 1
+
+            finished |= next_tokens == 3
+            if finished.all():
+                break
+
+        return token_ids[:, :length]
+
+    def _generate_with_past(self, encoder_hidden_states: np.ndarray) -> np.ndarray:
+        session = self.decoder_session
+        output_names = [self.token_output] + [
+            output.name for output in session.get_outputs()
+            if output.name.startswith("present.")
+        ]
+
+        batch_size = encoder_hidden_states.shape[0]
+
+        # the first step runs on empty past tensors, afterwards the present.*
+        # outputs are fed back as the matching past_key_values.* inputs
+        past = {}
+        for inp in self.past_inputs:
+            shape = [dim if isinstance(dim, int) else 0 for dim in inp.shape]
+            shape[0] = batch_size
+            past[inp.name] = OrtValue.ortvalue_from_numpy(np.zeros(shape, dtype=np.float32))
+
+        encoder_hidden_states = OrtValue.ortvalue_from_numpy(encoder_hidden_states)
+
+        token_ids = np.full((batch_size, 1), 2, dtype=np.int64)
+        finished = np.zeros(batch_size, dtype=bool)
+        input_ids = token_ids
+
+        for step in range(300):
+            binding = session.io_binding()
+            binding.bind_ortvalue_input("encoder_hidden_states", encoder_hidden_states)
+            binding.bind_cpu_input("input_ids", input_ids)
+            binding.bind_cpu_input("use_cache_branch", np.array([step > 0]))
+            for name, value in past.items():
+                binding.bind_ortvalue_input(name, value)
+            for name in output_names:
+                binding.bind_output(name)
+
+            session.run_with_iobinding(binding)
+            outputs = dict(zip(output_names, binding.get_outputs()))
+
+            next_tokens = self._next_tokens(outputs[self.token_output].numpy())
+            next_tokens[finished] = 3
+            input_ids = next_tokens[:, None]
+            token_ids = np.concatenate([token_ids, input_ids], axis=1)
+
+            finished |= next_tokens == 3
+            if finished.all():
                 break
 
+            # the cache branch returns empty placeholders for present.*.encoder.*,
+            # so the cross-attention keys/values from the first step are kept
+            past = {
+                name: outputs[name.replace("past_key_values.", "present.", 1)]
+                if step == 0 or ".encoder." not in name else value
+                for name, value in past.items()
+            }
+
         return token_ids
 
-    def _decode(self, token_ids: list[int]) -> str:
+    def _next_tokens(self, output: np.ndarray) -> np.ndarray:
+        if self.token_output == "next_token":
+            return output[:, -1].copy()
+
+        return output[:, -1, :].argmax(axis=-1)
+
+    def _decode(self, token_ids: np.ndarray) -> str:
         text = ""
 
         for token_id in token_ids:
@@ -88,7 +214,9 @@ class MangaOCR:
     def _postprocess(self, text: str) -> str:
         text = "".join(text.split())
         text = text.replace("…", "...")
-        text = re.sub("[・.]{2,}", lambda x: (x.end() - x.start()) * ".", text)
+        # runs of "." are already all dots, only runs containing "・" change
+        if "・" in text:
+            text = DOTS_RE.sub(lambda x: (x.end() - x.start()) * ".", text)
         text = jaconv.h2z(text, ascii=True, digit=True)
 
         return text
@@ -98,13 +226,26 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Manga OCR with ONNX Runtime")
-    parser.add_argument("--image", type=str, help="Path to the input image")
-    parser.add_argument("--encoder-model", type=str, help="Path to the ONNX model file")
-    parser.add_argument("--decoder-model", type=str, help="Path to the ONNX model file")
+    parser.add_argument("--image", type=str, nargs="+", help="Paths to the input images")
+    parser.add_argument(
+        "--encoder-model",
+        type=str,
+        help="Path to the ONNX model file (encoder_model.int8.onnx from quantize_onnx_models.py on CPU)",
+    )
+    parser.add_argument(
+        "--decoder-model",
+        type=str,
+        help="Path to the ONNX model file (decoder_model_merged.onnx enables the KV cache)",
+    )
     parser.add_argument("--vocab", type=str, help="Path to the vocabulary file")
+    parser.add_argument(
+        "--tensorrt",
+        action="store_true",
+        help="Run the encoder on TensorRT, engines are cached under models/trt_cache",
+    )
     args = parser.parse_args()
 
-    ocr = MangaOCR(args.encoder_model, args.decoder_model, args.vocab)
-    image = Image.open(args.image)
-    text = ocr(image)
-    print(text)
+    ocr = MangaOCR(args.encoder_model, args.decoder_model, args.vocab, tensorrt=args.tensorrt)
+    images = [Image.open(path) for path in args.image]
+    for text in ocr(images):
+        print(text)
@@ -0,0 +1,54 @@
+import os
+
+import onnxruntime as ort
+
+
+GPU_PROVIDERS = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+
+
+def tensorrt_providers(cache_path: str = "models/trt_cache", **options) -> list:
+    """Put TensorRT with FP16 ahead of GPU_PROVIDERS, keeping built engines on disk.
+
+    Inputs with dynamic axes need trt_profile_min/opt/max_shapes in options so
+    one cached engine covers them instead of a rebuild per new shape.
+    """
+    tensorrt = {
+        "trt_fp16_enable": True,
+        "trt_engine_cache_enable": True,
+        "trt_engine_cache_path": cache_path,
+        **options,
+    }
+
+    return [("TensorrtExecutionProvider", tensorrt), *GPU_PROVIDERS]
+
+
+def available_providers(providers: list = GPU_PROVIDERS) -> list:
+    """Keep the providers the installed onnxruntime build supports, in order."""
+    available = ort.get_available_providers()
+
+    return [
+        provider for provider in providers
+        if (provider[0] if isinstance(provider, tuple) else provider) in available
+    ]
+
+
+def runs_on_cpu(providers: list = GPU_PROVIDERS) -> bool:
+    """Whether a session made with these providers would run on the CPU provider."""
+    return available_providers(providers)[0] == "CPUExecutionProvider"
+
+
+def make_session(model_path: str, providers: list = GPU_PROVIDERS) -> ort.InferenceSession:
+    """Create an InferenceSession with all graph optimizations and one intra-op thread per core.
+
+    Providers missing from the installed onnxruntime build are skipped, so the
+    default list falls back to CPU when no GPU build is installed.
+    """
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    sess_options.intra_op_num_threads = os.cpu_count()
+    sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    sess_options.add_session_config_entry("session.disable_prepacking", "0")
+
+    return ort.InferenceSession(
+        model_path, sess_options, providers=available_providers(providers)
+    )
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from PIL import Image
+
+from manga_ocr_onnx_inference import MangaOCR
+
+
+class MangaCropReader(CalibrationDataReader):
+    """Feed preprocessed manga crops to the encoder during calibration."""
+
+    def __init__(self, crops_dir: str):
+        self.paths = [
+            os.path.join(crops_dir, name) for name in sorted(os.listdir(crops_dir))
+            if name.lower().endswith((".png", ".jpg", ".jpeg"))
+        ]
+        self.index = 0
+
+    def get_next(self) -> dict[str, np.ndarray] | None:
+        if self.index >= len(self.paths):
+            return None
+
+        image = Image.open(self.paths[self.index])
+        self.index += 1
+
+        return {"pixel_values": MangaOCR._preprocess(image)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Quantize the inpainting and OCR encoder models to int8")
+    parser.add_argument("--lama-model", type=str, help="Path to the LaMa ONNX model")
+    parser.add_argument("--encoder-model", type=str, help="Path to the manga-ocr encoder ONNX model")
+    parser.add_argument("--calibration-dir", type=str, help="Directory of manga crops used to calibrate the encoder")
+    args = parser.parse_args()
+
+    if not args.lama_model and not args.encoder_model:
+        parser.error("pass --lama-model and/or --encoder-model")
+    if args.encoder_model and not args.calibration_dir:
+        parser.error("--calibration-dir is required with --encoder-model")
+
+    outputs = {}
+    for model_path in filter(None, [args.lama_model, args.encoder_model]):
+        if not os.path.isfile(model_path):
+            parser.error(f"{model_path} does not exist")
+        outputs[model_path] = os.path.splitext(model_path)[0] + ".int8.onnx"
+        if os.path.abspath(outputs[model_path]) == os.path.abspath(model_path):
+            parser.error(f"refusing to overwrite {model_path}")
+
+    # weights only, activations are quantized on the fly at inference time.
+    # Conv is left in float32, ConvInteger is far slower than the float conv
+    # kernels on CPU and LaMa is almost entirely convs
+    if args.lama_model:
+        quantize_dynamic(
+            args.lama_model,
+            outputs[args.lama_model],
+            op_types_to_quantize=["MatMul", "Gemm"],
+            weight_type=QuantType.QInt8,
+        )
+
+    # the ViT encoder gets static activation ranges from real crops
+    if args.encoder_model:
+        quantize_static(
+            args.encoder_model,
+            outputs[args.encoder_model],
+            MangaCropReader(args.calibration_dir),
+            weight_type=QuantType.QInt8,
+        )
@@ -19,8 +19,36 @@ torch.onnx.export(
     },
 )
 
+import functools
 import numpy as np
-import onnxruntime as ort
+
+from onnx_session import make_session
+
+@functools.lru_cache(maxsize=4)
+def _get_session(model_path):
+    """Create the session for a model once and reuse it across calls"""
+    session = make_session(model_path)
+
+    # Get input and output names
+    input_name = session.get_inputs()[0].name  # Should be "x" based on export
+    output_name = session.get_outputs()[0].name  # Should be "sum" based on export
+
+    return session, input_name, output_name
+
+def _stack_into_buffer(session, samples):
+    """Copy samples into a float32 batch buffer kept on the session instead of np.stack"""
+    sample_shape = np.shape(samples[0])
+    buffer = getattr(session, "_batch_buffer", None)
+
+    # Grow the buffer only when the batch no longer fits
+    if buffer is None or buffer.shape[1:] != sample_shape or buffer.shape[0] < len(samples):
+        buffer = np.empty((len(samples), *sample_shape), dtype=np.float32)
+        session._batch_buffer = buffer
+
+    for i, sample in enumerate(samples):
+        np.copyto(buffer[i], sample)
+
+    return buffer[:len(samples)]
 
 def batch_inference_with_onnx(batch_input, model_path="onnx.pb"):
     """
@@ -33,25 +61,21 @@ def batch_inference_with_onnx(batch_input, model_path="onnx.pb"):
     Returns:
         Inference results for the entire batch
     """
-    # Create an ONNX Runtime session
-    session = ort.InferenceSession(model_path)
-
-    # Get input and output names
-    input_name = session.get_inputs()[0].name  # Should be "x" based on export
-    output_name = session.get_outputs()[0].name  # Should be "sum" based on export
+    # Reuse the cached ONNX Runtime session
+    session, input_name, output_name = _get_session(model_path)
 
     print(batch_input)
 
     # Ensure input is numpy array with correct type
     if not isinstance(batch_input, np.ndarray):
-        batch_input = np.stack(batch_input, axis=0)
+        batch_input = _stack_into_buffer(session, batch_input)
     else:
-        batch_input = batch_input.astype(np.float32)
+        batch_input = batch_input.astype(np.float32, copy=False)
 
     print("input ", batch_input)
 
     # Run inference on the entire batch at once
-    outputs = session.run(None, {input_name: batch_input})
+    outputs = session.run([output_name], {input_name: batch_input})
 
     return outputs[0]
 
@@ -71,9 +95,3 @@ if __name__ == "__main__":
 
     for i, result in enumerate(results):
         print(f"Batch {i+1} result shape: {results[i]}")
-
-    # For production use, you might want to add optimizations:
-    # session_options = ort.SessionOptions()
-    # session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-    # session_options.intra_op_num_threads = 4  # Parallel threads
-    # session = ort.InferenceSession(model_path, session_options)